@@ -1,15 +1,25 @@
 # itmo_telegram_bot.py
-import json
-import pandas as pd
+import asyncio
+import csv
 import re
+import sys
 import logging
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from itertools import groupby
+from typing import List, Dict, Optional, Tuple
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
     ContextTypes, ConversationHandler, filters
 )
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
+
 # Настройка логирования
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -20,28 +30,196 @@ logger = logging.getLogger(__name__)
 # Состояния диалога
 CHOOSING, TYPING_REPLY = range(2)
 
+# Максимальная длина одного сообщения
+MAX_MESSAGE_LENGTH = 4000
+
+# Размер кэша последних запросов find_program
+FIND_PROGRAM_CACHE_SIZE = 64
+
+# Поля программ с часто повторяющимися строками
+_INTERNED_FIELDS = ('program_name', 'program_code', 'duration')
+
+# Общий объект для скрытия клавиатуры
+_REMOVE_KB = ReplyKeyboardRemove()
+
+# Ключевые слова для автоматического определения запроса
+_GREETING_WORDS = ('привет', 'здравств', 'hello', 'hi')
+_PROGRAM_WORDS = ('программ', 'program')
+_SUBJECT_WORDS = ('предмет', 'дисциплин', 'курс')
+_COMPETENCY_WORDS = ('компетенц', 'навык', 'умение')
+_DURATION_WORDS = ('длительн', 'продолжительн', 'срок')
+
+# Альтернатива обернута в опережающую проверку нулевой ширины, чтобы
+# проверялась каждая позиция и пересекающиеся ключевые слова не терялись
+_KEYWORD_RE = re.compile('(?=' + '|'.join(
+    f"(?P<{category}>{'|'.join(map(re.escape, words))})"
+    for category, words in (
+        ('hi', _GREETING_WORDS),
+        ('prog', _PROGRAM_WORDS),
+        ('subj', _SUBJECT_WORDS),
+        ('comp', _COMPETENCY_WORDS),
+        ('dur', _DURATION_WORDS),
+    )
+) + ')')
+
+def _semester_key(semester: str):
+    """Ключ сортировки семестров: числовые по значению, остальные в конце"""
+    return (0, int(semester), '') if semester.isdigit() else (1, 0, semester)
+
 class ITMOTelegramBot:
     def __init__(self):
-        self.programs_data = self.load_programs_data()
-        self.curriculum_data = self.load_curriculum_data()
-        
+        # Данные загружаются в _async_init при старте приложения
+        self.programs_data: List[Dict] = []
+        self.curriculum_data: List[Dict] = []
+        self._main_kb = self._build_main_keyboard()
+        self._menu_dispatch = {
+            '📚 Список программ': self.show_programs,
+            '📖 Предметы программы': self.ask_program_for_subjects,
+            '🎯 Компетенции': self.ask_program_for_competencies,
+            '⏱️ Продолжительность': self.show_duration,
+            'ℹ️ О программе': self.ask_program_for_info,
+            '❓ Помощь': self.help_command,
+            '🔙 Назад': self.show_main_menu,
+        }
+        # Запасной вариант для кнопок, набранных вручную в другом регистре
+        self._menu_dispatch_lower = {
+            label.lower(): handler for label, handler in self._menu_dispatch.items()
+        }
+        self._build_caches()
+    
+    async def _async_init(self, application: Application):
+        """Загрузка данных в фоновых потоках при запуске приложения"""
+        self.programs_data, self.curriculum_data = await asyncio.gather(
+            asyncio.to_thread(self.load_programs_data),
+            asyncio.to_thread(self.load_curriculum_data),
+        )
+        self._build_caches()
+    
+    def _build_caches(self):
+        """Построение индексов и готовых ответов по загруженным данным"""
+        self._program_by_name_lower = {
+            p['program_name'].lower(): p for p in self.programs_data
+        }
+        self._program_name_pairs = list(self._program_by_name_lower.items())
+        self._find_program_cache: OrderedDict[str, Optional[Dict]] = OrderedDict()
+        self._subjects_by_program_semester = self._build_subjects_index()
+        self._subjects_msgs = {
+            p['program_name']: self._compute_subjects_messages(p['program_name'])
+            for p in self.programs_data
+        }
+        self._program_info_text = {
+            p['program_name']: self._compute_program_info_text(p)
+            for p in self.programs_data
+        }
+        self._programs_kb = self._build_programs_keyboard()
+        self._programs_text = self._compute_programs_text()
+        self._duration_reply_text = self._compute_duration_reply_text()
+        self._programs_list_text = self._compute_programs_list_text()
+        self._duration_text = self._compute_duration_text()
+        # Ответы в порядке приоритета категорий
+        self._keyword_responses = {
+            'hi': "👋 Привет! Чем могу помочь?",
+            'prog': self._programs_list_text,
+            'subj': "Выберите программу для просмотра предметов из меню 📖",
+            'comp': "Выберите программу для просмотра компетенций из меню 🎯",
+            'dur': self._duration_text,
+        }
+    
     def load_programs_data(self) -> List[Dict]:
         try:
-            with open('itmo_programs_data.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open('itmo_programs_data.json', 'rb') as f:
+                programs = _json_loads(f.read())
         except FileNotFoundError:
             logger.error("Файл itmo_programs_data.json не найден")
             return []
+        
+        # Одинаковые значения разных программ хранятся одним объектом
+        for program in programs:
+            for field in _INTERNED_FIELDS:
+                if isinstance(program.get(field), str):
+                    program[field] = sys.intern(program[field])
+            if isinstance(program.get('competencies'), list):
+                program['competencies'] = [
+                    sys.intern(comp) if isinstance(comp, str) else comp
+                    for comp in program['competencies']
+                ]
+        return programs
     
-    def load_curriculum_data(self) -> pd.DataFrame:
+    def load_curriculum_data(self) -> List[Dict]:
         try:
-            return pd.read_csv('itmo_curriculum.csv', encoding='utf-8')
+            with open('itmo_curriculum.csv', 'r', encoding='utf-8', newline='') as f:
+                return list(csv.DictReader(f))
         except FileNotFoundError:
             logger.error("Файл itmo_curriculum.csv не найден")
-            return pd.DataFrame()
+            return []
     
-    def get_main_keyboard(self):
-        """Клавиатура главного меню"""
+    def _build_subjects_index(self) -> Dict[str, List[Tuple]]:
+        """Индекс предметов по программе, сгруппированный по семестрам"""
+        rows_by_program: Dict[str, List[Tuple]] = {}
+        for row in self.curriculum_data:
+            if row.get('program'):
+                rows_by_program.setdefault(row['program'], []).append(
+                    (row['semester'], row['subject'], row['credits'])
+                )
+        
+        # Сопоставляем программы из JSON с программами учебного плана по вхождению названия
+        index = {}
+        for program in self.programs_data:
+            name = program['program_name']
+            rows = [
+                row
+                for csv_program, program_rows in rows_by_program.items()
+                if name in csv_program
+                for row in program_rows
+            ]
+            if rows:
+                rows.sort(key=lambda row: _semester_key(row[0]))
+                index[name] = [
+                    (semester, [(subject, credits) for _, subject, credits in sem_rows])
+                    for semester, sem_rows in groupby(rows, key=lambda row: row[0])
+                ]
+        return index
+    
+    def _compute_program_info_text(self, program: Dict) -> str:
+        """Построение текста с информацией о программе"""
+        return f"""
+📚 Программа: {program['program_name']}
+🔢 Код: {program.get('program_code', 'N/A')}
+⏱️ Продолжительность: {program.get('duration', 'Не указана')}
+
+📝 Описание:
+{program.get('description', 'Описание отсутствует')}
+
+📊 Статистика:
+• Дисциплин: {len(program.get('curriculum', []))}
+• Компетенций: {len(program.get('competencies', []))}
+        """
+    
+    def _compute_subjects_messages(self, program_name: str) -> List[str]:
+        """Построение сообщений со списком предметов программы"""
+        semesters = self._subjects_by_program_semester.get(program_name, [])
+        if not semesters:
+            return [f"Предметы для программы '{program_name}' не найдены."]
+        
+        # Группируем по семестрам
+        parts = [f"📖 Предметы программы '{program_name}':\n\n"]
+        
+        for semester, sem_subjects in semesters:
+            parts.append(f"🎓 Семестр {semester}:\n")
+            
+            for subject, credits in sem_subjects:
+                parts.append(f"   • {subject} ({credits} кредитов)\n")
+            parts.append("\n")
+        response = "".join(parts)
+        
+        # Если сообщение слишком длинное, разбиваем на части
+        return [
+            response[i:i + MAX_MESSAGE_LENGTH]
+            for i in range(0, len(response), MAX_MESSAGE_LENGTH)
+        ]
+    
+    def _build_main_keyboard(self) -> ReplyKeyboardMarkup:
+        """Построение клавиатуры главного меню"""
         keyboard = [
             ['📚 Список программ'],
             ['📖 Предметы программы', '🎯 Компетенции'],
@@ -50,13 +228,21 @@ class ITMOTelegramBot:
         ]
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    def get_programs_keyboard(self):
-        """Клавиатура выбора программы"""
+    def _build_programs_keyboard(self) -> ReplyKeyboardMarkup:
+        """Построение клавиатуры выбора программы"""
         programs = [prog['program_name'] for prog in self.programs_data]
         keyboard = [programs[i:i+2] for i in range(0, len(programs), 2)]
         keyboard.append(['🔙 Назад'])
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
+    def get_main_keyboard(self):
+        """Клавиатура главного меню"""
+        return self._main_kb
+    
+    def get_programs_keyboard(self):
+        """Клавиатура выбора программы"""
+        return self._programs_kb
+    
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
         user = update.message.from_user
@@ -98,44 +284,32 @@ class ITMOTelegramBot:
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка текстовых сообщений"""
-        text = update.message.text.lower()
+        raw = update.message.text
         
-        if text == '📚 список программ':
-            await self.show_programs(update, context)
-        elif text == '📖 предметы программы':
-            await self.ask_program_for_subjects(update, context)
-        elif text == '🎯 компетенции':
-            await self.ask_program_for_competencies(update, context)
-        elif text == '⏱️ продолжительность':
-            await self.show_duration(update, context)
-        elif text == 'ℹ️ о программе':
-            await self.ask_program_for_info(update, context)
-        elif text == '❓ помощь':
-            await self.help_command(update, context)
-        elif text == '🔙 назад':
-            await update.message.reply_text(
-                "Главное меню:",
-                reply_markup=self.get_main_keyboard()
-            )
-        else:
-            # Попытка автоматического определения запроса
-            response = self.auto_detect_response(text)
-            await update.message.reply_text(response)
-    
-    async def show_programs(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Показать список программ"""
-        if not self.programs_data:
-            await update.message.reply_text("Информация о программах временно недоступна.")
+        # Текст кнопки приходит без изменений, поэтому сначала ищем точное совпадение
+        handler = self._menu_dispatch.get(raw)
+        if handler is None:
+            text = raw.lower()
+            handler = self._menu_dispatch_lower.get(text)
+        if handler:
+            await handler(update, context)
             return
         
-        response = "🎓 Доступные магистерские программы:\n\n"
-        for program in self.programs_data:
-            response += f"• {program['program_name']}\n"
-            response += f"  Код: {program.get('program_code', 'N/A')}\n"
-            response += f"  Длительность: {program.get('duration', 'Не указана')}\n\n"
-        
+        # Попытка автоматического определения запроса
+        response = self.auto_detect_response(text)
         await update.message.reply_text(response)
     
+    async def show_main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Вернуться в главное меню"""
+        await update.message.reply_text(
+            "Главное меню:",
+            reply_markup=self.get_main_keyboard()
+        )
+    
+    async def show_programs(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Показать список программ"""
+        await update.message.reply_text(self._programs_text)
+    
     async def ask_program_for_subjects(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Запросить выбор программы для показа предметов"""
         context.user_data['action'] = 'subjects'
@@ -184,49 +358,14 @@ class ITMOTelegramBot:
     
     async def show_program_info(self, update: Update, program: Dict):
         """Показать информацию о программе"""
-        response = f"""
-📚 Программа: {program['program_name']}
-🔢 Код: {program.get('program_code', 'N/A')}
-⏱️ Продолжительность: {program.get('duration', 'Не указана')}
-
-📝 Описание:
-{program.get('description', 'Описание отсутствует')}
-
-📊 Статистика:
-• Дисциплин: {len(program.get('curriculum', []))}
-• Компетенций: {len(program.get('competencies', []))}
-        """
-        await update.message.reply_text(response)
+        await update.message.reply_text(self._program_info_text[program['program_name']])
     
     async def show_program_subjects(self, update: Update, program: Dict):
         """Показать предметы программы"""
-        program_name = program['program_name']
-        subjects_df = self.curriculum_data[
-            self.curriculum_data['program'].str.contains(program_name, na=False)
-        ]
-        
-        if subjects_df.empty:
-            await update.message.reply_text(f"Предметы для программы '{program_name}' не найдены.")
-            return
-        
-        # Группируем по семестрам
-        response = f"📖 Предметы программы '{program_name}':\n\n"
-        
-        for semester in sorted(subjects_df['semester'].unique()):
-            sem_subjects = subjects_df[subjects_df['semester'] == semester]
-            response += f"🎓 Семестр {semester}:\n"
-            
-            for _, subject in sem_subjects.iterrows():
-                response += f"   • {subject['subject']} ({subject['credits']} кредитов)\n"
-            response += "\n"
-        
-        # Если сообщение слишком длинное, разбиваем на части
-        if len(response) > 4000:
-            parts = [response[i:i+4000] for i in range(0, len(response), 4000)]
-            for part in parts:
-                await update.message.reply_text(part)
-        else:
-            await update.message.reply_text(response)
+        # Части отправляются последовательно: это куски одного текста, и при
+        # параллельной отправке Telegram не гарантирует порядок их доставки
+        for part in self._subjects_msgs[program['program_name']]:
+            await update.message.reply_text(part)
     
     async def show_program_competencies(self, update: Update, program: Dict):
         """Показать компетенции программы"""
@@ -235,78 +374,108 @@ class ITMOTelegramBot:
             await update.message.reply_text("Компетенции не найдены.")
             return
         
-        response = f"🎯 Компетенции программы '{program['program_name']}':\n\n"
+        parts = [f"🎯 Компетенции программы '{program['program_name']}':\n\n"]
         for i, comp in enumerate(competencies, 1):
-            response += f"{i}. {comp}\n"
+            parts.append(f"{i}. {comp}\n")
+        response = "".join(parts)
         
         await update.message.reply_text(response)
     
     async def show_duration(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать продолжительность обучения"""
-        if not self.programs_data:
-            await update.message.reply_text("Информация о программах недоступна.")
-            return
-        
-        response = "⏱️ Продолжительность обучения:\n\n"
-        for program in self.programs_data:
-            response += f"• {program['program_name']}: {program.get('duration', '2 года')}\n"
-        
-        await update.message.reply_text(response)
+        await update.message.reply_text(self._duration_reply_text)
     
     def find_program(self, program_name: str) -> Optional[Dict]:
         """Найти программу по названию"""
-        for program in self.programs_data:
-            if program_name.lower() in program['program_name'].lower():
+        cache = self._find_program_cache
+        if program_name in cache:
+            cache.move_to_end(program_name)
+            return cache[program_name]
+        
+        program = self._lookup_program(program_name)
+        # Кэшируем и неудачные поиски, чтобы не повторять перебор
+        cache[program_name] = program
+        if len(cache) > FIND_PROGRAM_CACHE_SIZE:
+            cache.popitem(last=False)
+        return program
+    
+    def _lookup_program(self, program_name: str) -> Optional[Dict]:
+        """Поиск программы по индексу названий"""
+        name_lower = program_name.lower()
+        program = self._program_by_name_lower.get(name_lower)
+        if program:
+            return program
+        
+        for stored_name, program in self._program_name_pairs:
+            if name_lower in stored_name:
                 return program
         return None
     
-    def auto_detect_response(self, text: str) -> str:
-        """Автоматическое определение запроса"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['привет', 'здравств', 'hello', 'hi']):
-            return "👋 Привет! Чем могу помочь?"
-        
-        if any(word in text_lower for word in ['программ', 'program']):
-            return self.get_programs_list_text()
-        
-        if any(word in text_lower for word in ['предмет', 'дисциплин', 'курс']):
-            return "Выберите программу для просмотра предметов из меню 📖"
-        
-        if any(word in text_lower for word in ['компетенц', 'навык', 'умение']):
-            return "Выберите программу для просмотра компетенций из меню 🎯"
-        
-        if any(word in text_lower for word in ['длительн', 'продолжительн', 'срок']):
-            return self.get_duration_text()
+    def auto_detect_response(self, text_lower: str) -> str:
+        """Автоматическое определение запроса (текст уже в нижнем регистре)"""
+        found = {m.lastgroup for m in _KEYWORD_RE.finditer(text_lower)}
+        for category, response in self._keyword_responses.items():
+            if category in found:
+                return response
         
         return "Не совсем понял ваш вопрос. Используйте кнопки меню или напишите /help для справки."
     
     def get_programs_list_text(self) -> str:
         """Текст списка программ"""
+        return self._programs_list_text
+    
+    def get_duration_text(self) -> str:
+        """Текст продолжительности"""
+        return self._duration_text
+    
+    def _compute_programs_text(self) -> str:
+        """Построение ответа со списком программ"""
+        if not self.programs_data:
+            return "Информация о программах временно недоступна."
+        
+        parts = ["🎓 Доступные магистерские программы:\n\n"]
+        for program in self.programs_data:
+            parts.append(f"• {program['program_name']}\n")
+            parts.append(f"  Код: {program.get('program_code', 'N/A')}\n")
+            parts.append(f"  Длительность: {program.get('duration', 'Не указана')}\n\n")
+        return "".join(parts)
+    
+    def _compute_duration_reply_text(self) -> str:
+        """Построение ответа с продолжительностью обучения"""
         if not self.programs_data:
             return "Информация о программах недоступна."
         
-        response = "🎓 Доступные программы:\n\n"
+        parts = ["⏱️ Продолжительность обучения:\n\n"]
         for program in self.programs_data:
-            response += f"• {program['program_name']}\n"
-        response += "\nВыберите программу из меню для подробной информации."
-        return response
+            parts.append(f"• {program['program_name']}: {program.get('duration', '2 года')}\n")
+        return "".join(parts)
     
-    def get_duration_text(self) -> str:
-        """Текст продолжительности"""
+    def _compute_programs_list_text(self) -> str:
+        """Построение текста списка программ"""
+        if not self.programs_data:
+            return "Информация о программах недоступна."
+        
+        parts = ["🎓 Доступные программы:\n\n"]
+        for program in self.programs_data:
+            parts.append(f"• {program['program_name']}\n")
+        parts.append("\nВыберите программу из меню для подробной информации.")
+        return "".join(parts)
+    
+    def _compute_duration_text(self) -> str:
+        """Построение текста продолжительности"""
         if not self.programs_data:
             return "Информация недоступна."
         
-        response = "⏱️ Продолжительность:\n\n"
+        parts = ["⏱️ Продолжительность:\n\n"]
         for program in self.programs_data:
-            response += f"• {program['program_name']}: {program.get('duration', '2 года')}\n"
-        return response
+            parts.append(f"• {program['program_name']}: {program.get('duration', '2 года')}\n")
+        return "".join(parts)
     
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Отмена диалога"""
         await update.message.reply_text(
             'Диалог завершен. Используйте /start для начала нового диалога.',
-            reply_markup=ReplyKeyboardRemove()
+            reply_markup=_REMOVE_KB
         )
         return ConversationHandler.END
 
@@ -319,7 +488,12 @@ def main():
     bot = ITMOTelegramBot()
     
     # Создаем Application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(bot._async_init)
+        .build()
+    )
     
     # Создаем ConversationHandler
     conv_handler = ConversationHandler(
@@ -327,7 +501,7 @@ def main():
         states={
             CHOOSING: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message),
-                MessageHandler(filters.Regex('^(Искусственный интеллект|AI Product Management)$'), 
+                MessageHandler(filters.Text({'Искусственный интеллект', 'AI Product Management'}),
                              bot.handle_program_selection),
             ],
         },